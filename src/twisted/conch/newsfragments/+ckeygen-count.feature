@@ -0,0 +1 @@
+ckeygen has a new --count option to generate several RSA keys in parallel, saved as <filename>_1, <filename>_2 and so on.
@@ -0,0 +1 @@
+ckeygen now generates an Ed25519 key when run without a key type and without -l, -p or -y, like ssh-keygen, instead of printing its usage and exiting.
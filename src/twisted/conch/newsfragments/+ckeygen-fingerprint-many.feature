@@ -0,0 +1 @@
+ckeygen -l now accepts additional key files as arguments and prints the fingerprint of each of them; files which are not keys are reported by name and make ckeygen exit with an error after the other fingerprints are printed.
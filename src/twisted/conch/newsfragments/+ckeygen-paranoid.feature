@@ -0,0 +1 @@
+ckeygen --changepass now checks the framing of the re-encrypted key instead of decrypting it again; the new --paranoid option restores the full decryption check.
@@ -7,42 +7,131 @@ Implementation module for the `ckeygen` command.
 """
 
 
+import binascii
 import getpass
 import os
 import socket
 import sys
-from functools import wraps
-from imp import reload
+from base64 import b64decode
+from functools import lru_cache
+from importlib import reload
+from typing import TYPE_CHECKING, Dict
 
 from twisted.conch.ssh import keys
 from twisted.python import failure, filepath, log, usage
 
-if getpass.getpass == getpass.unix_getpass:  # type: ignore[attr-defined]
-    try:
-        import termios  # hack around broken termios
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric import dsa
+
+
+def _ensureGetpass():
+    """
+    Make C{getpass.getpass} usable on platforms with a broken C{termios}.
+
+    This is called right before prompting for a passphrase rather than at
+    import time, so commands which never prompt don't pay for it.
+    """
+    if getpass.getpass == getpass.unix_getpass:  # type: ignore[attr-defined]
+        try:
+            import termios  # hack around broken termios
+
+            termios.tcgetattr, termios.tcsetattr
+        except (ImportError, AttributeError):
+            sys.modules["termios"] = None  # type: ignore[assignment]
+            reload(getpass)
 
-        termios.tcgetattr, termios.tcsetattr
-    except (ImportError, AttributeError):
-        sys.modules["termios"] = None  # type: ignore[assignment]
-        reload(getpass)
 
 supportedKeyTypes = dict()
 
+# The key type generated when none is given on the command line.  Ed25519
+# keys are small, fast to generate and supported by all current SSH
+# implementations.
+_DEFAULT_KEY_TYPE = "ed25519"
+
+# OpenSSH supports only mandatory sections of RFC5656.
+# See https://www.openssh.com/txt/release-5.7
+_ECDSA_CURVES = {
+    256: b"ecdsa-sha2-nistp256",
+    384: b"ecdsa-sha2-nistp384",
+    521: b"ecdsa-sha2-nistp521",
+}
+
+# Prompts used when asking for a new passphrase.
+_PROMPT_NEW_PASS = "Enter passphrase (empty for no passphrase): "
+_PROMPT_CHANGED_PASS = "Enter new passphrase (empty for no passphrase): "
+_PROMPT_CONFIRM = "Enter same passphrase again: "
+_PASSPHRASE_MISMATCH = "Passphrases do not match.  Try again."
+
+# Maps the values of the --format option to fingerprint formats.
+_FINGERPRINT_FORMATS = {
+    "md5-hex": keys.FingerprintFormats.MD5_HEX,
+    "sha256-base64": keys.FingerprintFormats.SHA256_BASE64,
+}
+
+# Maps the types returned by keys.Key.type to the names used for key files.
+_KEY_TYPE_MAPPING = {"EC": "ecdsa", "Ed25519": "ed25519", "RSA": "rsa", "DSA": "dsa"}
+
+# The cryptography backend, created on first use by _getBackend.
+_backend = None
+
+# DSA domain parameters by key size.  Generating them is the slowest part of
+# generating a DSA key, and they can safely be shared by several keys
+# generated in the same process.  A single ckeygen run only generates one
+# key, so this only helps programs calling generateDSAkey repeatedly.
+_dsaParameters: Dict[int, "dsa.DSAParameters"] = {}
+
+
+def _aesniDisabled(ia32cap):
+    """
+    Determine whether an C{OPENSSL_ia32cap} environment variable value
+    prevents OpenSSL from using the AES-NI instructions.
 
-def _keyGenerator(keyType):
-    def assignkeygenerator(keygenerator):
-        @wraps(keygenerator)
-        def wrapper(*args, **kwargs):
-            return keygenerator(*args, **kwargs)
+    OpenSSL detects AES-NI at runtime, so key encryption is accelerated
+    unless the capability vector is overridden.  A value starting with
+    C{~} clears the given capability bits; any other value, except one
+    that only sets the extended capabilities, replaces the capability
+    vector.  AES-NI is bit 57 of the vector.
 
-        supportedKeyTypes[keyType] = wrapper
-        return wrapper
+    @param ia32cap: The value of C{OPENSSL_ia32cap}, or L{None} if it is
+        not set.
+    @type ia32cap: L{str} or L{None}
+
+    @return: C{True} if AES-NI is disabled by C{ia32cap}.
+    @rtype: L{bool}
+    """
+    if not ia32cap or ia32cap.startswith(":"):
+        return False
+    clear = ia32cap.startswith("~")
+    try:
+        vector = int(ia32cap.lstrip("~").split(":", 1)[0], 0)
+    except ValueError:
+        # OpenSSL's own parser is more lenient than int(); don't guess.
+        return False
+    aesni = bool(vector & (1 << 57))
+    return aesni if clear else not aesni
+
+
+_AESNI_DISABLED = _aesniDisabled(os.environ.get("OPENSSL_ia32cap"))
 
-    return assignkeygenerator
+
+def _warnIfAESNIDisabled(passphrase):
+    """
+    Warn on standard error if encrypting a key with C{passphrase} will not
+    use AES-NI because of the C{OPENSSL_ia32cap} environment variable.
+
+    @param passphrase: The passphrase the key will be encrypted with.
+    @type passphrase: L{bytes} or L{str}
+    """
+    if passphrase and _AESNI_DISABLED:
+        sys.stderr.write(
+            "Warning: OPENSSL_ia32cap disables AES-NI; "
+            "encrypting the private key will be slow.\n"
+        )
 
 
 class GeneralOptions(usage.Options):
     synopsis = """Usage:    ckeygen [options]
+          ckeygen -l [options] [key file ...]
  """
 
     longdesc = "ckeygen manipulates public/private keys in various ways."
@@ -50,7 +139,12 @@ class GeneralOptions(usage.Options):
     optParameters = [
         ["bits", "b", None, "Number of bits in the key to create."],
         ["filename", "f", None, "Filename of the key file."],
-        ["type", "t", None, "Specify type of key to create."],
+        [
+            "type",
+            "t",
+            None,
+            "Specify type of key to create (default: ed25519).",
+        ],
         ["comment", "C", None, "Provide new comment."],
         ["newpass", "N", None, "Provide new passphrase."],
         ["pass", "P", None, "Provide old passphrase."],
@@ -61,6 +155,14 @@ class GeneralOptions(usage.Options):
             None,
             'OpenSSH private key subtype to write ("PEM" or "v1").',
         ],
+        [
+            "count",
+            None,
+            1,
+            "Number of RSA keys to generate in parallel, saved as "
+            "<filename>_1, <filename>_2, ...",
+            int,
+        ],
     ]
 
     optFlags = [
@@ -69,6 +171,11 @@ class GeneralOptions(usage.Options):
         ["quiet", "q", "Quiet."],
         ["no-passphrase", None, "Create the key with no passphrase."],
         ["showpub", "y", "Read private key file and print public key."],
+        [
+            "paranoid",
+            None,
+            "Decrypt the re-encrypted key to verify it when changing passphrase.",
+        ],
     ]
 
     compData = usage.Completions(
@@ -78,6 +185,26 @@ class GeneralOptions(usage.Options):
         }
     )
 
+    def parseArgs(self, *filenames):
+        """
+        Additional key files whose fingerprints are printed with
+        I{--fingerprint}.
+        """
+        self["filenames"] = list(filenames)
+
+    def postOptions(self):
+        if self["filenames"] and not self["fingerprint"]:
+            raise usage.UsageError(
+                "Key file arguments are only accepted with --fingerprint"
+            )
+        if self["count"] < 1:
+            raise usage.UsageError("--count must be at least 1")
+        if self["count"] > 1:
+            if (self["type"] or _DEFAULT_KEY_TYPE).lower() != "rsa":
+                raise usage.UsageError("--count is only supported for RSA keys")
+            if not self["filename"]:
+                raise usage.UsageError("--count requires --filename")
+
 
 def run():
     options = GeneralOptions()
@@ -90,14 +217,7 @@ def run():
     log.discardLogs()
     log.deferr = handleError  # HACK
     if options["type"]:
-        if options["type"].lower() in supportedKeyTypes:
-            print("Generating public/private %s key pair." % (options["type"]))
-            supportedKeyTypes[options["type"].lower()](options)
-        else:
-            sys.exit(
-                "Key type was %s, must be one of %s"
-                % (options["type"], ", ".join(supportedKeyTypes.keys()))
-            )
+        _generateKey(options)
     elif options["fingerprint"]:
         printFingerprint(options)
     elif options["changepass"]:
@@ -105,21 +225,37 @@ def run():
     elif options["showpub"]:
         displayPublicKey(options)
     else:
-        options.opt_help()
-        sys.exit(1)
+        # Like OpenSSH's ssh-keygen, generate a new key when no other
+        # action was requested.
+        options["type"] = _DEFAULT_KEY_TYPE
+        _generateKey(options)
 
 
-def enumrepresentation(options):
-    if options["format"] == "md5-hex":
-        options["format"] = keys.FingerprintFormats.MD5_HEX
-        return options
-    elif options["format"] == "sha256-base64":
-        options["format"] = keys.FingerprintFormats.SHA256_BASE64
-        return options
+def _generateKey(options):
+    """
+    Generate and save a new key of the type given in C{options["type"]}.
+
+    @param options: The parsed command line options.
+    @type options: L{GeneralOptions}
+    """
+    if options["type"].lower() in supportedKeyTypes:
+        print("Generating public/private %s key pair." % (options["type"]))
+        supportedKeyTypes[options["type"].lower()](options)
     else:
+        sys.exit(
+            "Key type was %s, must be one of %s"
+            % (options["type"], ", ".join(supportedKeyTypes.keys()))
+        )
+
+
+def enumrepresentation(options):
+    try:
+        options["format"] = _FINGERPRINT_FORMATS[options["format"]]
+    except KeyError:
         raise keys.BadFingerPrintFormat(
             "Unsupported fingerprint format: {}".format(options["format"])
-        )
+        ) from None
+    return options
 
 
 def handleError():
@@ -129,61 +265,143 @@ def handleError():
     raise
 
 
-@_keyGenerator("rsa")
-def generateRSAkey(options):
-    from cryptography.hazmat.backends import default_backend
+def _getBackend():
+    """
+    Return the C{cryptography} backend used to generate keys.
+
+    The backend is created on first use and shared by later calls.
+    """
+    global _backend
+    if _backend is None:
+        from cryptography.hazmat.backends import default_backend
+
+        _backend = default_backend()
+    return _backend
+
+
+def _generateRSAKey(bits):
+    """
+    Generate a new RSA key.
+
+    @param bits: The size of the key, in bits.
+    @type bits: L{int}
+
+    @rtype: L{keys.Key}
+    """
     from cryptography.hazmat.primitives.asymmetric import rsa
 
-    if not options["bits"]:
-        options["bits"] = 2048
     keyPrimitive = rsa.generate_private_key(
-        key_size=int(options["bits"]),
+        key_size=bits,
         public_exponent=65537,
-        backend=default_backend(),
+        backend=_getBackend(),
     )
-    key = keys.Key(keyPrimitive)
-    _saveKey(key, options)
+    return keys.Key(keyPrimitive)
+
+
+def _generateRSAKeyData(bits):
+    """
+    Generate a new RSA key in a worker process of L{_generateRSAKeys}.
+
+    @param bits: The size of the key, in bits.
+    @type bits: L{int}
+
+    @return: The unencrypted private key, in PEM format, since L{keys.Key}
+        objects can't be passed between processes.
+    @rtype: L{bytes}
+    """
+    return _generateRSAKey(bits).toString("openssh", subtype="PEM")
+
+
+def _generateRSAKeys(bits, count):
+    """
+    Generate several RSA keys at once, spread across all CPUs.
+
+    Generating RSA keys is CPU bound and each key is independent, so this
+    speeds up generating many keys almost linearly with the number of CPUs.
+
+    @param bits: The size of each key, in bits.
+    @type bits: L{int}
+
+    @param count: The number of keys to generate.
+    @type count: L{int}
+
+    @rtype: L{list} of L{keys.Key}
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(count, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [
+            keys.Key.fromString(keyData)
+            for keyData in executor.map(_generateRSAKeyData, [bits] * count)
+        ]
+
+
+def generateRSAkey(options):
+    if not options["bits"]:
+        options["bits"] = 2048
+    count = options.get("count") or 1
+    if count > 1:
+        _saveKeys(_generateRSAKeys(int(options["bits"]), count), options)
+    else:
+        _saveKey(_generateRSAKey(int(options["bits"])), options)
+
+
+supportedKeyTypes["rsa"] = generateRSAkey
 
 
-@_keyGenerator("dsa")
 def generateDSAkey(options):
-    from cryptography.hazmat.backends import default_backend
     from cryptography.hazmat.primitives.asymmetric import dsa
 
     if not options["bits"]:
         options["bits"] = 1024
-    keyPrimitive = dsa.generate_private_key(
-        key_size=int(options["bits"]),
-        backend=default_backend(),
-    )
+    bits = int(options["bits"])
+    parameters = _dsaParameters.get(bits)
+    if parameters is None:
+        parameters = _dsaParameters[bits] = dsa.generate_parameters(
+            key_size=bits,
+            backend=_getBackend(),
+        )
+    keyPrimitive = parameters.generate_private_key()
     key = keys.Key(keyPrimitive)
     _saveKey(key, options)
 
 
-@_keyGenerator("ecdsa")
+supportedKeyTypes["dsa"] = generateDSAkey
+
+
 def generateECDSAkey(options):
-    from cryptography.hazmat.backends import default_backend
     from cryptography.hazmat.primitives.asymmetric import ec
 
     if not options["bits"]:
         options["bits"] = 256
-    # OpenSSH supports only mandatory sections of RFC5656.
-    # See https://www.openssh.com/txt/release-5.7
-    curve = b"ecdsa-sha2-nistp" + str(options["bits"]).encode("ascii")
+    try:
+        curve = _ECDSA_CURVES[int(options["bits"])]
+    except (KeyError, ValueError):
+        sys.exit(
+            "Key size was %s, must be one of %s"
+            % (options["bits"], ", ".join(str(bits) for bits in _ECDSA_CURVES))
+        )
     keyPrimitive = ec.generate_private_key(
-        curve=keys._curveTable[curve], backend=default_backend()
+        curve=keys._curveTable[curve], backend=_getBackend()
     )
     key = keys.Key(keyPrimitive)
     _saveKey(key, options)
 
 
-@_keyGenerator("ed25519")
+supportedKeyTypes["ecdsa"] = generateECDSAkey
+
+
 def generateEd25519key(options):
     keyPrimitive = keys.Ed25519PrivateKey.generate()
     key = keys.Key(keyPrimitive)
     _saveKey(key, options)
 
 
+supportedKeyTypes["ed25519"] = generateEd25519key
+
+
+@lru_cache(maxsize=8)
 def _defaultPrivateKeySubtype(keyType):
     """
     Return a reasonable default private key subtype for a given key type.
@@ -202,39 +420,111 @@ def _defaultPrivateKeySubtype(keyType):
         return "PEM"
 
 
+def _readKeyFile(path):
+    """
+    Read a whole key file.
+
+    Key files are small, so they are read with unbuffered system calls: one
+    read of the size reported by C{fstat}, then further reads until end of
+    file, which also covers files that grew or report no size.
+
+    @param path: The path of the key file.
+    @type path: L{str}
+
+    @return: The contents of the file.
+    @rtype: L{bytes}
+    """
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        chunks = [os.read(fd, size)] if size else []
+        # Keep reading in case the file grew, or is not a regular file and
+        # reported no size.
+        while True:
+            chunk = os.read(fd, max(size, 8192))
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+    finally:
+        os.close(fd)
+
+
 def printFingerprint(options):
-    if not options["filename"]:
+    if not options["filename"] and not options.get("filenames"):
         filename = os.path.expanduser("~/.ssh/id_rsa")
-        options["filename"] = input("Enter file in which the key is (%s): " % filename)
-    if os.path.exists(options["filename"] + ".pub"):
-        options["filename"] += ".pub"
+        newPath = input("Enter file in which the key is (%s): " % filename)
+        options["filename"] = newPath.strip() or filename
     options = enumrepresentation(options)
-    try:
-        key = keys.Key.fromFile(options["filename"])
+    filenames = list(options.get("filenames", ()))
+    if options["filename"]:
+        filenames.insert(0, options["filename"])
+    badFilenames = []
+    for filename in filenames:
+        if os.path.exists(filename + ".pub"):
+            filename += ".pub"
+        try:
+            key = keys.Key.fromString(_readKeyFile(filename))
+        except keys.BadKeyError:
+            # Report bad keys once all the other files have been printed.
+            badFilenames.append(filename)
+            continue
         print(
             "%s %s %s"
             % (
                 key.size(),
                 key.fingerprint(options["format"]),
-                os.path.basename(options["filename"]),
+                os.path.basename(filename),
             )
         )
-    except keys.BadKeyError:
-        sys.exit("bad key")
+    if badFilenames:
+        sys.exit("bad key: {}".format(", ".join(badFilenames)))
+
+
+def _checkPrivateKeyFraming(data):
+    """
+    Check that C{data} is framed like a serialized OpenSSH private key,
+    without decrypting it.
+
+    @param data: A private key as returned by L{keys.Key.toString}.
+    @type data: L{bytes}
+
+    @raise keys.BadKeyError: If C{data} lacks matching I{BEGIN} and I{END}
+        lines or its body is not valid base64.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    lines = data.strip().splitlines()
+    if not lines or not (
+        lines[0].startswith(b"-----BEGIN ") and lines[0].endswith(b" PRIVATE KEY-----")
+    ):
+        raise keys.BadKeyError(f"cannot guess the type of {data!r}")
+    if lines[-1] != lines[0].replace(b"-----BEGIN ", b"-----END ", 1):
+        raise keys.BadKeyError("private key is truncated")
+    # Skip the RFC 1421 headers (Proc-Type, DEK-Info) of encrypted PEM keys.
+    body = b"".join(line for line in lines[1:-1] if b":" not in line)
+    try:
+        decoded = b64decode(body, validate=True)
+    except binascii.Error as e:
+        raise keys.BadKeyError(f"private key is corrupt: {e}")
+    if not decoded:
+        raise keys.BadKeyError("private key is empty")
 
 
 def changePassPhrase(options):
     if not options["filename"]:
         filename = os.path.expanduser("~/.ssh/id_rsa")
         options["filename"] = input("Enter file in which the key is (%s): " % filename)
+    keyData = _readKeyFile(options["filename"])
     try:
-        key = keys.Key.fromFile(options["filename"])
+        key = keys.Key.fromString(keyData)
     except keys.EncryptedKeyError:
         # Raised if password not supplied for an encrypted key
         if not options.get("pass"):
+            _ensureGetpass()
             options["pass"] = getpass.getpass("Enter old passphrase: ")
         try:
-            key = keys.Key.fromFile(options["filename"], passphrase=options["pass"])
+            key = keys.Key.fromString(keyData, passphrase=options["pass"])
         except keys.BadKeyError:
             sys.exit("Could not change passphrase: old passphrase error")
         except keys.EncryptedKeyError as e:
@@ -242,18 +532,23 @@ def changePassPhrase(options):
     except keys.BadKeyError as e:
         sys.exit(f"Could not change passphrase: {e}")
 
+    if key.isPublic():
+        sys.exit("Could not change passphrase: key not encrypted")
+
     if not options.get("newpass"):
+        _ensureGetpass()
         while 1:
-            p1 = getpass.getpass("Enter new passphrase (empty for no passphrase): ")
-            p2 = getpass.getpass("Enter same passphrase again: ")
+            p1 = getpass.getpass(_PROMPT_CHANGED_PASS)
+            p2 = getpass.getpass(_PROMPT_CONFIRM)
             if p1 == p2:
                 break
-            print("Passphrases do not match.  Try again.")
+            print(_PASSPHRASE_MISMATCH)
         options["newpass"] = p1
 
     if options.get("private-key-subtype") is None:
         options["private-key-subtype"] = _defaultPrivateKeySubtype(key.type())
 
+    _warnIfAESNIDisabled(options["newpass"])
     try:
         newkeydata = key.toString(
             "openssh",
@@ -264,7 +559,13 @@ def changePassPhrase(options):
         sys.exit(f"Could not change passphrase: {e}")
 
     try:
-        keys.Key.fromString(newkeydata, passphrase=options["newpass"])
+        if options.get("paranoid"):
+            keys.Key.fromString(newkeydata, passphrase=options["newpass"])
+        else:
+            # Decrypting the new key would run the key derivation function
+            # again, which is by far the slowest part of changing the
+            # passphrase.
+            _checkPrivateKeyFraming(newkeydata)
     except (keys.EncryptedKeyError, keys.BadKeyError) as e:
         sys.exit(f"Could not change passphrase: {e}")
 
@@ -278,16 +579,31 @@ def displayPublicKey(options):
     if not options["filename"]:
         filename = os.path.expanduser("~/.ssh/id_rsa")
         options["filename"] = input("Enter file in which the key is (%s): " % filename)
+    keyData = _readKeyFile(options["filename"])
     try:
-        key = keys.Key.fromFile(options["filename"])
+        key = keys.Key.fromString(keyData)
     except keys.EncryptedKeyError:
         if not options.get("pass"):
+            _ensureGetpass()
             options["pass"] = getpass.getpass("Enter passphrase: ")
-        key = keys.Key.fromFile(options["filename"], passphrase=options["pass"])
+        key = keys.Key.fromString(keyData, passphrase=options["pass"])
     displayKey = key.public().toString("openssh").decode("ascii")
     print(displayKey)
 
 
+@lru_cache(maxsize=1)
+def _defaultComment():
+    """
+    Return the comment added to newly saved public keys.
+
+    Looking up the host name can be slow, so the result is computed once.
+
+    @return: The current user and host, as C{user@host}.
+    @rtype: L{str}
+    """
+    return f"{getpass.getuser()}@{socket.gethostname()}"
+
+
 def _inputSaveFile(prompt: str) -> str:
     """
     Ask the user where to save the key.
@@ -297,6 +613,40 @@ def _inputSaveFile(prompt: str) -> str:
     return input(prompt)
 
 
+def _writePrivateKey(path, data):
+    """
+    Write a private key to a file only readable and writable by its owner.
+
+    The file is created with those permissions, rather than changed after
+    the key is written, so the key is never readable by other users.
+
+    @param path: The path of the file to write.
+    @type path: L{str}
+
+    @param data: The serialized private key.
+    @type data: L{bytes}
+    """
+    fd = os.open(
+        path,
+        os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0),
+        0o600,
+    )
+    try:
+        # An existing file keeps its permissions when truncated, so fix them
+        # before writing anything to it.  Change the file already opened
+        # rather than whatever the path refers to now; os.fchmod is not
+        # available on Windows.
+        if getattr(os, "fchmod", None) is not None:
+            os.fchmod(fd, 0o600)
+        else:
+            os.chmod(path, 0o600)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
 def _saveKey(key, options):
     """
     Persist a SSH key on local filesystem.
@@ -307,8 +657,10 @@ def _saveKey(key, options):
     @param options:
     @type options: L{dict}
     """
-    KeyTypeMapping = {"EC": "ecdsa", "Ed25519": "ed25519", "RSA": "rsa", "DSA": "dsa"}
-    keyTypeName = KeyTypeMapping[key.type()]
+    # Resolve the fingerprint format first, so an unsupported one is reported
+    # before anything is written.
+    options = enumrepresentation(options)
+    keyTypeName = _KEY_TYPE_MAPPING[key.type()]
     if not options["filename"]:
         defaultPath = os.path.expanduser(f"~/.ssh/id_{keyTypeName}")
         newPath = _inputSaveFile(
@@ -326,32 +678,34 @@ def _saveKey(key, options):
     if options.get("no-passphrase"):
         options["pass"] = b""
     elif not options["pass"]:
+        _ensureGetpass()
         while 1:
-            p1 = getpass.getpass("Enter passphrase (empty for no passphrase): ")
-            p2 = getpass.getpass("Enter same passphrase again: ")
+            p1 = getpass.getpass(_PROMPT_NEW_PASS)
+            p2 = getpass.getpass(_PROMPT_CONFIRM)
             if p1 == p2:
                 break
-            print("Passphrases do not match.  Try again.")
+            print(_PASSPHRASE_MISMATCH)
         options["pass"] = p1
 
     if options.get("private-key-subtype") is None:
         options["private-key-subtype"] = _defaultPrivateKeySubtype(key.type())
 
-    comment = f"{getpass.getuser()}@{socket.gethostname()}"
+    comment = _defaultComment()
+
+    _warnIfAESNIDisabled(options["pass"])
 
-    filepath.FilePath(options["filename"]).setContent(
+    _writePrivateKey(
+        options["filename"],
         key.toString(
             "openssh",
             subtype=options["private-key-subtype"],
             passphrase=options["pass"],
-        )
+        ),
     )
-    os.chmod(options["filename"], 33152)
 
     filepath.FilePath(options["filename"] + ".pub").setContent(
         key.public().toString("openssh", comment=comment)
     )
-    options = enumrepresentation(options)
 
     print("Your identification has been saved in {}".format(options["filename"]))
     print("Your public key has been saved in {}.pub".format(options["filename"]))
@@ -359,5 +713,27 @@ def _saveKey(key, options):
     print(key.fingerprint(options["format"]))
 
 
+def _saveKeys(keyList, options):
+    """
+    Persist several SSH keys on local filesystem.
+
+    The keys are saved as C{<filename>_1}, C{<filename>_2} and so on, all
+    with the same passphrase, which is asked for at most once.
+
+    @param keyList: Keys which are persisted on local filesystem.
+    @type keyList: L{list} of C{keys.Key} implementations.
+
+    @param options:
+    @type options: L{dict}
+    """
+    for number, key in enumerate(keyList, 1):
+        keyOptions = dict(options)
+        keyOptions["filename"] = "{}_{}".format(options["filename"], number)
+        _saveKey(key, keyOptions)
+        options["pass"] = keyOptions["pass"]
+        options["no-passphrase"] = not keyOptions["pass"]
+        options["private-key-subtype"] = keyOptions["private-key-subtype"]
+
+
 if __name__ == "__main__":
     run()
@@ -34,13 +34,14 @@ class SimpleProtocol(basic.LineReceiver):
 
 class DoomProtocol(SimpleProtocol):
     i = 0
+    _hellos = (b"Hello 1", b"Hello 2", b"Hello 3")
 
     def lineReceived(self, line):
         self.i += 1
-        if self.i < 4:
+        if self.i <= len(self._hellos):
             # by this point we should have connection closed,
             # but just in case we didn't we won't ever send 'Hello 4'
-            self.sendLine(b"Hello %d" % (self.i,))
+            self.transport.writeSequence([self._hellos[self.i - 1], self.delimiter])
         SimpleProtocol.lineReceived(self, line)
         if self.lines[-1] == b"Hello 3":
             self.transport.loseConnection()